@@ -1,6 +1,23 @@
 import fnmatch
+import re
+import sys
+from bisect import bisect_left
 from enum import Enum
-from typing import List, Set, Union
+from functools import lru_cache
+from itertools import chain, compress, repeat
+from typing import (
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 from iamdata import IAMData
 
@@ -24,37 +41,194 @@ class InvalidActionHandling(Enum):
     KEEP = "keep"  # Keep invalid patterns as-is
 
 
-def _get_all_actions() -> Set[str]:
-    """Helper function to retrieve all known IAM actions."""
-    all_actions: Set[str] = set()
-    service_keys = iam_data.services.get_service_keys()
-    for service_prefix in service_keys:
-        service_actions = iam_data.actions.get_actions_for_service(service_prefix)
-        if service_actions:
-            for action_name in service_actions:
-                all_actions.add(f"{service_prefix}:{action_name}")
-    return all_actions
+class _ServiceActions(NamedTuple):
+    """
+    Action names of a single service, in the forms used for matching.
 
+    Matches are returned as the prebuilt 'service:action' strings, so
+    expanding a pattern picks existing strings instead of formatting new ones.
+    """
 
-def _expand_single_pattern(
-    action_pattern: str,
-    invalid_handling: InvalidActionHandling = InvalidActionHandling.RAISE_ERROR,
-) -> Set[str]:
+    names: Tuple[str, ...]
+    # 'service:action' strings, in the same order as names
+    qualified_names: Tuple[str, ...]
+    # Lowercase action name to 'service:action' string
+    by_lower: Dict[str, str]
+    # Lowercase names in sorted order, with the 'service:action' strings alongside
+    sorted_lower: Tuple[str, ...]
+    sorted_qualified_names: Tuple[str, ...]
+
+
+class _ActionIndex:
     """
-    Expands a single IAM action pattern.
+    Lookup tables derived from an IAMData instance.
+
+    Each service's actions are loaded the first time a pattern targets that
+    service, so expanding 's3:Get*' doesn't read the data of every service.
+    """
+
+    def __init__(self, source: IAMData):
+        self.source = source
+        self.service_keys: Tuple[str, ...] = tuple(
+            map(sys.intern, source.services.get_service_keys())
+        )
+        self.service_keys_lower: Tuple[str, ...] = tuple(
+            key.lower() for key in self.service_keys
+        )
+        self.service_keys_by_lower: Dict[str, str] = dict(
+            zip(self.service_keys_lower, self.service_keys)
+        )
+        self._service_actions: Dict[str, _ServiceActions] = {}
+        self._sorted_actions: Optional[Tuple[str, ...]] = None
+        self._actions_by_lower_name: Optional[Dict[str, List[str]]] = None
+
+    def get_service_actions(self, service_key: str) -> _ServiceActions:
+        """Returns the actions of a known service key."""
+        service_actions = self._service_actions.get(service_key)
+        if service_actions is None:
+            # Interned so names shared by many services, such as 'TagResource',
+            # are stored once
+            names = tuple(
+                map(
+                    sys.intern,
+                    self.source.actions.get_actions_for_service(service_key) or (),
+                )
+            )
+            qualified_names = tuple(map(f"{service_key}:".__add__, names))
+            lowers = tuple(map(str.lower, names))
+            # A literal name resolves to the first action equal to it ignoring
+            # case, so the pairs are inserted in reverse to let the first win
+            by_lower = dict(zip(reversed(lowers), reversed(qualified_names)))
+            # Wildcards must see every action, including names that differ
+            # only by case, so the sorted pairs are not taken from by_lower
+            sorted_pairs = sorted(zip(lowers, qualified_names))
+            service_actions = _ServiceActions(
+                names,
+                qualified_names,
+                by_lower,
+                tuple(lower for lower, _ in sorted_pairs),
+                tuple(qualified_name for _, qualified_name in sorted_pairs),
+            )
+            self._service_actions[service_key] = service_actions
+        return service_actions
+
+    def get_actions_named(self, action_name_lower: str) -> Sequence[str]:
+        """
+        Returns the 'service:action' names of every service declaring an
+        action, given its lowercase name.
+        """
+        if self._actions_by_lower_name is None:
+            actions_by_lower_name: Dict[str, List[str]] = {}
+            for key in self.service_keys:
+                by_lower = self.get_service_actions(key).by_lower
+                for lower, qualified_name in by_lower.items():
+                    actions_by_lower_name.setdefault(lower, []).append(qualified_name)
+            self._actions_by_lower_name = actions_by_lower_name
+        return self._actions_by_lower_name.get(action_name_lower, ())
+
+    def get_sorted_actions(self) -> Tuple[str, ...]:
+        """Returns every unique 'service:action' name of the dataset, sorted."""
+        if self._sorted_actions is None:
+            # Every name starts with its 'service:' prefix, so sorting the
+            # prefixes and then each service's names on their own gives the
+            # global order with much smaller sorts
+            self._sorted_actions = tuple(
+                chain.from_iterable(
+                    sorted(set(self.get_service_actions(key).qualified_names))
+                    for key in sorted(set(self.service_keys), key="{}:".format)
+                )
+            )
+        return self._sorted_actions
+
+
+_action_index: Optional[_ActionIndex] = None
+
+
+def _get_action_index() -> _ActionIndex:
+    """
+    Returns the lookup tables for the current `iam_data`.
+
+    The index is built on first use and rebuilt only if `iam_data` is
+    replaced, so each part of the IAM dataset is read once per process.
+    """
+    global _action_index
+    if _action_index is None or _action_index.source is not iam_data:
+        _action_index = _ActionIndex(iam_data)
+        # Drop results computed from the previous dataset
+        _match_service_keys.cache_clear()
+        _expand_pattern.cache_clear()
+        _expand_sorted.cache_clear()
+        _invert_patterns.cache_clear()
+    return _action_index
+
+
+_Matcher = Callable[[str], Optional["re.Match[str]"]]
 
-    Args:
-        action_pattern: The pattern to expand
-        invalid_handling: How to handle invalid patterns
+
+@lru_cache(maxsize=2048)
+def _compile_pattern(pattern: str, ignore_case: bool = False) -> _Matcher:
+    """
+    Translates a wildcard pattern into a compiled regex match function.
+
+    Results are cached, so repeated expansions of the same pattern skip both
+    the translation and the compilation.
+    """
+    flags = re.IGNORECASE if ignore_case else 0
+    return re.compile(fnmatch.translate(pattern), flags).match
+
+
+@lru_cache(maxsize=1024)
+def _compile_patterns(patterns: Tuple[str, ...], ignore_case: bool = False) -> _Matcher:
+    """
+    Combines several wildcard patterns into a single compiled match function.
+
+    The returned function matches a string if any of the patterns does.
+    """
+    if len(patterns) == 1:
+        return _compile_pattern(patterns[0], ignore_case)
+    flags = re.IGNORECASE if ignore_case else 0
+    return re.compile(
+        "|".join(f"(?:{fnmatch.translate(pattern)})" for pattern in patterns), flags
+    ).match
+
+
+@lru_cache(maxsize=1024)
+def _match_service_keys(index: _ActionIndex, service_pattern: str) -> Tuple[str, ...]:
+    """Returns the service keys of the index matching a wildcard service pattern."""
+    star_split = _split_star_pattern(service_pattern)
+    if star_split is not None:
+        head, tail = star_split
+        return tuple(
+            service_key
+            for service_key, service_key_lower in zip(
+                index.service_keys, index.service_keys_lower
+            )
+            if service_key_lower.startswith(head)
+            and service_key_lower.endswith(tail, len(head))
+        )
+    service_match = _compile_pattern(service_pattern, ignore_case=True)
+    return tuple(
+        service_key for service_key in index.service_keys if service_match(service_key)
+    )
+
+
+def _resolve_pattern(
+    index: _ActionIndex,
+    action_pattern: str,
+    invalid_handling: InvalidActionHandling,
+) -> Optional[Tuple[Sequence[str], str, str]]:
+    """
+    Validates a pattern and resolves its service part against the index.
 
     Returns:
-        A set of expanded actions
+        A tuple of the matching service keys, the lowercase service part and
+        the lowercase action part, or None if the pattern is invalid and
+        invalid_handling is not RAISE_ERROR.
 
     Raises:
         InvalidActionPatternError: If pattern is invalid and invalid_handling is RAISE_ERROR
     """
-    expanded_actions: Set[str] = set()
-    target_service_keys: List[str] = []
+    target_service_keys: Sequence[str] = ()
 
     if action_pattern == "*":
         service_pattern_lower = "*"
@@ -65,11 +239,7 @@ def _expand_single_pattern(
                 pattern=action_pattern,
                 message="Must be 'service:action' or '*'. Missing colon.",
             )
-        elif invalid_handling == InvalidActionHandling.KEEP:
-            # Return the original pattern as a single-item set
-            return {action_pattern}
-        else:  # REMOVE
-            return set()
+        return None
     else:
         try:
             service_part, action_part = action_pattern.split(":", 1)
@@ -82,10 +252,7 @@ def _expand_single_pattern(
                             "after the colon."
                         ),
                     )
-                elif invalid_handling == InvalidActionHandling.KEEP:
-                    return {action_pattern}
-                else:  # REMOVE
-                    return set()
+                return None
             service_pattern_lower = service_part.lower()
             action_name_pattern_lower = action_part.lower()
         except ValueError:  # Should not happen, but defensive
@@ -93,62 +260,202 @@ def _expand_single_pattern(
                 raise InvalidActionPatternError(
                     pattern=action_pattern, message="Unexpected parsing error."
                 )
-            elif invalid_handling == InvalidActionHandling.KEEP:
-                return {action_pattern}
-            else:  # REMOVE
-                return set()
-
-    all_service_keys = iam_data.services.get_service_keys()
-    lower_to_original_key = {key.lower(): key for key in all_service_keys}
+            return None
 
     if service_pattern_lower == "*":
-        target_service_keys = list(all_service_keys)
+        target_service_keys = index.service_keys
     elif "*" in service_pattern_lower or "?" in service_pattern_lower:
-        for lower_key, original_key in lower_to_original_key.items():
-            if fnmatch.fnmatchcase(lower_key, service_pattern_lower):
-                target_service_keys.append(original_key)
+        target_service_keys = _match_service_keys(index, service_pattern_lower)
     else:
-        if service_pattern_lower in lower_to_original_key:
-            target_service_keys = [lower_to_original_key[service_pattern_lower]]
+        service_key = index.service_keys_by_lower.get(service_pattern_lower)
+        if service_key is not None:
+            target_service_keys = (service_key,)
+
+    if not target_service_keys:
+        if invalid_handling == InvalidActionHandling.RAISE_ERROR:
+            raise InvalidActionPatternError(
+                pattern=action_pattern, message=f"Service '{service_part}' not found"
+            )
+        return None
 
-    # If no matching services found and we're keeping invalid patterns
-    if not target_service_keys and invalid_handling == InvalidActionHandling.KEEP:
-        return {action_pattern}
+    return target_service_keys, service_pattern_lower, action_name_pattern_lower
 
-    # If no matching services found and we're removing invalid patterns
-    if not target_service_keys and invalid_handling == InvalidActionHandling.REMOVE:
-        return set()
 
-    # If no matching services found and we're raising errors
-    if (
-        not target_service_keys
-        and invalid_handling == InvalidActionHandling.RAISE_ERROR
-    ):
-        raise InvalidActionPatternError(
-            pattern=action_pattern, message=f"Service '{service_part}' not found"
-        )
+_MAX_CHAR = chr(sys.maxunicode)
 
-    for service_key in target_service_keys:
-        service_actions = iam_data.actions.get_actions_for_service(service_key)
-        if not service_actions:
-            continue
 
-        if action_name_pattern_lower == "*":
-            for action_name in service_actions:
-                expanded_actions.add(f"{service_key}:{action_name}")
-        elif "*" in action_name_pattern_lower or "?" in action_name_pattern_lower:
-            for action_name in service_actions:
-                if fnmatch.fnmatchcase(action_name.lower(), action_name_pattern_lower):
-                    expanded_actions.add(f"{service_key}:{action_name}")
+def _split_star_pattern(pattern: str) -> Optional[Tuple[str, str]]:
+    """
+    Splits a pattern with a single '*' and no other wildcards into the
+    literal text before and after the '*'.
+
+    Returns:
+        A (head, tail) tuple, or None if the pattern has another shape.
+    """
+    head, star, tail = pattern.partition("*")
+    if not star or "*" in tail or any(char in pattern for char in "?["):
+        return None
+    return head, tail
+
+
+def _add_service_matches(
+    expanded_actions: Set[str],
+    service_actions: _ServiceActions,
+    action_name_patterns: Iterable[str],
+) -> None:
+    """
+    Adds the actions of one service that match any of the given lowercase
+    action patterns to expanded_actions.
+
+    Literal names are looked up directly; all wildcard patterns are combined
+    so the service's actions are scanned at most once.
+    """
+    wildcard_patterns: List[str] = []
+    for action_name_pattern in action_name_patterns:
+        if action_name_pattern == "*":
+            expanded_actions.update(service_actions.qualified_names)
+            return
+        star_split = _split_star_pattern(action_name_pattern)
+        # The bisect bound bumps the last character of the prefix, which is
+        # impossible for the highest code point, so those use the regex
+        if star_split is not None and not star_split[0].endswith(_MAX_CHAR):
+            head, tail = star_split
+            sorted_lower = service_actions.sorted_lower
+            start, end = 0, len(sorted_lower)
+            if head:
+                # Names sharing a prefix form a contiguous run of the sorted names
+                start = bisect_left(sorted_lower, head)
+                end = bisect_left(
+                    sorted_lower, head[:-1] + chr(ord(head[-1]) + 1), start
+                )
+            if tail:
+                # Checking the tail from len(head) onwards keeps it from
+                # overlapping the head
+                expanded_actions.update(
+                    compress(
+                        service_actions.sorted_qualified_names[start:end],
+                        map(
+                            str.endswith,
+                            sorted_lower[start:end],
+                            repeat(tail),
+                            repeat(len(head)),
+                        ),
+                    )
+                )
+            else:
+                expanded_actions.update(
+                    service_actions.sorted_qualified_names[start:end]
+                )
+        elif "*" in action_name_pattern or "?" in action_name_pattern:
+            wildcard_patterns.append(action_name_pattern)
         else:
-            for action_name in service_actions:
-                if action_name.lower() == action_name_pattern_lower:
-                    expanded_actions.add(f"{service_key}:{action_name}")
-                    break
+            qualified_name = service_actions.by_lower.get(action_name_pattern)
+            if qualified_name is not None:
+                expanded_actions.add(qualified_name)
+
+    if wildcard_patterns:
+        action_match = _compile_patterns(
+            tuple(sorted(wildcard_patterns)), ignore_case=True
+        )
+        expanded_actions.update(
+            compress(
+                service_actions.qualified_names,
+                map(action_match, service_actions.names),
+            )
+        )
+
+
+@lru_cache(maxsize=4096)
+def _expand_pattern(
+    index: _ActionIndex,
+    action_pattern: str,
+    invalid_handling: InvalidActionHandling,
+) -> FrozenSet[str]:
+    """
+    Expands a single IAM action pattern against the given index.
+
+    Returns a frozenset of the matching 'service:action' names, or of the
+    pattern itself when it is invalid and invalid_handling is KEEP.
+
+    Raises:
+        InvalidActionPatternError: If pattern is invalid and invalid_handling is RAISE_ERROR
+    """
+    if "*" not in action_pattern and "?" not in action_pattern:
+        # Fast path for exact action names; anything that is not found falls
+        # through so that errors and KEEP are handled as usual.
+        service_part, _, action_part = action_pattern.partition(":")
+        service_key = index.service_keys_by_lower.get(service_part.lower())
+        if service_key is not None:
+            qualified_name = index.get_service_actions(service_key).by_lower.get(
+                action_part.lower()
+            )
+            if qualified_name is not None:
+                return frozenset({qualified_name})
+
+    resolved = _resolve_pattern(index, action_pattern, invalid_handling)
+    if resolved is None:
+        if invalid_handling == InvalidActionHandling.KEEP:
+            # Return the original pattern as a single-item set
+            return frozenset({action_pattern})
+        return frozenset()  # REMOVE
+    target_service_keys, service_pattern_lower, action_name_pattern_lower = resolved
+
+    expanded_actions: Set[str] = set()
+    if service_pattern_lower == "*" and not any(
+        char in action_name_pattern_lower for char in "*?"
+    ):
+        # '*:PassRole' is answered from the action name index instead of
+        # looking the name up in every service
+        expanded_actions.update(index.get_actions_named(action_name_pattern_lower))
+    else:
+        for service_key in target_service_keys:
+            _add_service_matches(
+                expanded_actions,
+                index.get_service_actions(service_key),
+                (action_name_pattern_lower,),
+            )
 
     # If no matching actions found and we're keeping invalid patterns
     if not expanded_actions and invalid_handling == InvalidActionHandling.KEEP:
-        return {action_pattern}
+        return frozenset({action_pattern})
+
+    return frozenset(expanded_actions)
+
+
+def _expand_many(
+    index: _ActionIndex,
+    action_patterns: Tuple[str, ...],
+    invalid_handling: InvalidActionHandling,
+) -> Set[str]:
+    """
+    Expands several patterns with a single scan per target service.
+
+    Patterns are grouped by the services they resolve to, and each service's
+    actions are matched once against the union of its action patterns.
+    Invalid patterns are skipped unless invalid_handling is RAISE_ERROR, so
+    callers needing KEEP semantics must expand patterns one by one.
+
+    Returns a mutable set of the matching 'service:action' names.
+    """
+    action_patterns_by_service: Dict[str, Set[str]] = {}
+    # Repeated patterns only need to be validated and resolved once
+    for action_pattern in dict.fromkeys(action_patterns):
+        resolved = _resolve_pattern(index, action_pattern, invalid_handling)
+        if resolved is None:
+            continue
+        target_service_keys, _, action_name_pattern_lower = resolved
+        for service_key in target_service_keys:
+            action_patterns_by_service.setdefault(service_key, set()).add(
+                action_name_pattern_lower
+            )
+
+    expanded_actions: Set[str] = set()
+    for service_key, action_name_patterns in action_patterns_by_service.items():
+        _add_service_matches(
+            expanded_actions,
+            index.get_service_actions(service_key),
+            action_name_patterns,
+        )
 
     return expanded_actions
 
@@ -179,19 +486,36 @@ def expand_actions(
     else:
         patterns = action_patterns
 
-    combined_actions: Set[str] = set()
-    for pattern in patterns:
-        try:
-            expanded = _expand_single_pattern(pattern, invalid_handling)
-            combined_actions.update(expanded)
-        except InvalidActionPatternError:
-            if invalid_handling == InvalidActionHandling.RAISE_ERROR:
-                raise
-            elif invalid_handling == InvalidActionHandling.KEEP:
-                combined_actions.add(pattern)
-            # For REMOVE, we just skip it
+    return list(_expand_sorted(_get_action_index(), tuple(patterns), invalid_handling))
+
 
-    return sorted(list(combined_actions))
+@lru_cache(maxsize=1024)
+def _expand_sorted(
+    index: _ActionIndex,
+    patterns: Tuple[str, ...],
+    invalid_handling: InvalidActionHandling,
+) -> Tuple[str, ...]:
+    """Cached implementation of `expand_actions` for a given index."""
+    if "*" in patterns and invalid_handling != InvalidActionHandling.KEEP:
+        # '*' already matches every action, so the other patterns only need
+        # to be validated
+        if invalid_handling == InvalidActionHandling.RAISE_ERROR:
+            for pattern in patterns:
+                _resolve_pattern(index, pattern, invalid_handling)
+        return index.get_sorted_actions()
+    if len(patterns) == 1:
+        return tuple(sorted(_expand_pattern(index, patterns[0], invalid_handling)))
+    if invalid_handling != InvalidActionHandling.KEEP:
+        return tuple(sorted(_expand_many(index, patterns, invalid_handling)))
+
+    # KEEP needs each pattern expanded on its own, so that patterns matching
+    # nothing are kept. _expand_pattern does not raise for KEEP, which lets
+    # set.union merge the cached results in one call.
+    combined_actions = frozenset().union(
+        *[_expand_pattern(index, pattern, invalid_handling) for pattern in patterns]
+    )
+
+    return tuple(sorted(combined_actions))
 
 
 def invert_actions(
@@ -222,18 +546,27 @@ def invert_actions(
     else:
         patterns = action_patterns
 
-    total_actions_to_exclude: Set[str] = set()
-    for pattern in patterns:
-        try:
-            excluded_for_pattern = _expand_single_pattern(pattern, invalid_handling)
-            total_actions_to_exclude.update(excluded_for_pattern)
-        except InvalidActionPatternError:
-            if invalid_handling == InvalidActionHandling.RAISE_ERROR:
-                raise
-            # For KEEP and REMOVE in invert context, we just skip it
-            # since we're excluding actions, not including them
-
-    all_actions = _get_all_actions()
-    inverted_actions = all_actions - total_actions_to_exclude
-
-    return sorted(list(inverted_actions))
+    return list(
+        _invert_patterns(_get_action_index(), tuple(patterns), invalid_handling)
+    )
+
+
+@lru_cache(maxsize=32)
+def _invert_patterns(
+    index: _ActionIndex,
+    patterns: Tuple[str, ...],
+    invalid_handling: InvalidActionHandling,
+) -> Tuple[str, ...]:
+    """Cached implementation of `invert_actions` for a given index."""
+    # Invalid patterns are skipped for both KEEP and REMOVE in invert context,
+    # since we're excluding actions, not including them
+    total_actions_to_exclude = _expand_many(index, patterns, invalid_handling)
+
+    # Filtering the pre-sorted actions keeps them in order, so no sort is needed
+    return tuple(
+        [
+            action
+            for action in index.get_sorted_actions()
+            if action not in total_actions_to_exclude
+        ]
+    )
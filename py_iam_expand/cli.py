@@ -1,18 +1,19 @@
 import argparse
 import json
 import sys
+from functools import lru_cache
 
-from .actions import (
-    InvalidActionHandling,
-    InvalidActionPatternError,
-    expand_actions,
-    invert_actions,
-)
-from .policy import expand_policy_actions
 from .utils import get_version
 
 
-def main():
+@lru_cache(maxsize=1)
+def _build_parser() -> argparse.ArgumentParser:
+    """
+    Build the CLI argument parser.
+
+    The parser holds no per-invocation state, so it is built once and reused
+    by every call to main() in the same process.
+    """
     parser = argparse.ArgumentParser(
         description=(
             "Expand AWS IAM action provided as arguments/stdin lines OR "
@@ -71,8 +72,23 @@ def main():
         ),
     )
 
+    return parser
+
+
+def main():
+    parser = _build_parser()
     args = parser.parse_args()
 
+    # Imported here so that --version and --help skip importing iamdata and
+    # the expansion modules
+    from .actions import (
+        InvalidActionHandling,
+        InvalidActionPatternError,
+        expand_actions,
+        invert_actions,
+    )
+    from .policy import expand_policy_actions
+
     # Map CLI options to enum values
     invalid_handling_map = {
         "raise": InvalidActionHandling.RAISE_ERROR,
@@ -151,8 +167,8 @@ def main():
                 )
 
             if result_actions:
-                for action in result_actions:
-                    print(action)
+                sys.stdout.write("\n".join(result_actions))
+                sys.stdout.write("\n")
 
     except InvalidActionPatternError as e:
         print(f"Error: {e}", file=sys.stderr)
@@ -3,6 +3,45 @@ from typing import Any, Dict, List
 
 from .actions import InvalidActionHandling, InvalidActionPatternError, expand_actions
 
+_JSON_SCALAR_TYPES = (str, int, float, bool, type(None))
+
+
+def _copy_json_value(value: Any) -> Any:
+    """
+    Copies the dicts and lists of a parsed JSON value.
+
+    The other values JSON can hold (strings, numbers, booleans and None) are
+    immutable, so they are shared instead of copied. This keeps the result
+    independent of the input at a fraction of the cost of `copy.deepcopy`.
+    Values JSON can't produce, such as dict subclasses or sets, are still
+    copied with `copy.deepcopy`.
+    """
+    value_type = type(value)
+    if value_type is dict:
+        return {key: _copy_json_value(item) for key, item in value.items()}
+    if value_type is list:
+        return [_copy_json_value(item) for item in value]
+    if value_type in _JSON_SCALAR_TYPES:
+        return value
+    return deepcopy(value)
+
+
+def _validate_statement(index: int, statement: Any) -> None:
+    """
+    Checks the types of a statement and its Action/NotAction elements.
+
+    Raises:
+        TypeError: If the statement is not a dictionary, or its Action or
+                   NotAction is neither a string nor a list.
+    """
+    if not isinstance(statement, dict):
+        raise TypeError(f"Statement at index {index} is not a dictionary.")
+    for key in ("Action", "NotAction"):
+        if key in statement and not isinstance(statement[key], (str, list)):
+            raise TypeError(
+                f"Statement {index}: '{key}' must be a string or list of strings."
+            )
+
 
 def expand_policy_actions(
     policy_data: Dict[str, Any],
@@ -24,7 +63,8 @@ def expand_policy_actions(
                                     - KEEP: Keep invalid patterns in the result (default)
 
     Returns:
-        A dictionary representing the policy with expanded actions.
+        A dictionary representing the policy with expanded actions. It is a
+        copy, so policy_data itself is left unchanged.
 
     Raises:
         ValueError: If the policy structure is invalid (e.g., missing Statement).
@@ -35,9 +75,7 @@ def expand_policy_actions(
     if not isinstance(policy_data, dict):
         raise TypeError("Policy data must be a dictionary.")
 
-    policy_copy = deepcopy(policy_data)
-
-    statements = policy_copy.get("Statement")
+    statements = policy_data.get("Statement")
 
     if statements is None:
         raise ValueError("Policy does not contain a 'Statement' key.")
@@ -45,10 +83,14 @@ def expand_policy_actions(
     if not isinstance(statements, list):
         raise TypeError("'Statement' value must be a list.")
 
+    # The whole structure is checked before copying or expanding anything, so
+    # malformed policies fail without paying for either
     for i, statement in enumerate(statements):
-        if not isinstance(statement, dict):
-            raise TypeError(f"Statement at index {i} is not a dictionary.")
+        _validate_statement(i, statement)
+
+    policy_copy: Dict[str, Any] = _copy_json_value(policy_data)
 
+    for i, statement in enumerate(policy_copy["Statement"]):
         try:
             if "Action" in statement:
                 original_action = statement["Action"]
@@ -61,10 +103,6 @@ def expand_policy_actions(
                         for p in original_action
                         if isinstance(p, str) and p.strip()
                     ]  # Filter non-strings/empty
-                else:
-                    raise TypeError(
-                        f"Statement {i}: 'Action' must be a string or list of strings."
-                    )
 
                 if patterns_to_expand:
                     expanded = expand_actions(
@@ -85,10 +123,6 @@ def expand_policy_actions(
                         for p in original_not_action
                         if isinstance(p, str) and p.strip()
                     ]
-                else:
-                    raise TypeError(
-                        f"Statement {i}: 'NotAction' must be a string or list of strings."
-                    )
 
                 if patterns_to_expand:
                     expanded = expand_actions(
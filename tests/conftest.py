@@ -1,25 +1,59 @@
-from typing import Any, Dict
-from unittest.mock import patch
+import json
+from contextlib import contextmanager
+from typing import Any, Callable, ContextManager, Dict, FrozenSet, Iterator, List
+from unittest.mock import MagicMock, patch
 
 import pytest
 
+from py_iam_expand import actions
+
+ACTIONS_BY_SERVICE: Dict[str, List[str]] = {
+    "s3": ["GetObject", "GetBucket"],
+    "ec2": ["DescribeInstances", "DescribeVolumes"],
+    "iam": ["PassRole", "CreateAccessKey", "ListAccessKeys"],
+    "sts": ["AssumeRole"],
+}
+
+
+@contextmanager
+def _patch_iam_data(actions_by_service: Dict[str, List[str]]) -> Iterator[MagicMock]:
+    """Replaces iam_data with a mock serving the given actions per service"""
+    with patch.object(actions, "iam_data") as mock:
+        mock.services.get_service_keys.return_value = list(actions_by_service)
+        mock.actions.get_actions_for_service.side_effect = actions_by_service.get
+        yield mock
+
 
 @pytest.fixture(autouse=True)
 def mock_iam_data():
     """Mock IAMData to return consistent test data"""
-    with patch("py_iam_expand.actions.iam_data") as mock:
-        mock.services.get_service_keys.return_value = ["s3", "ec2", "iam", "sts"]
-        mock.actions.get_actions_for_service.side_effect = lambda service: {
-            "s3": ["GetObject", "GetBucket"],
-            "ec2": ["DescribeInstances", "DescribeVolumes"],
-            "iam": ["PassRole", "CreateAccessKey", "ListAccessKeys"],
-            "sts": ["AssumeRole"],
-        }.get(service, [])
+    with _patch_iam_data(ACTIONS_BY_SERVICE) as mock:
         yield mock
 
 
 @pytest.fixture
-def sample_policy() -> Dict[str, Any]:
+def use_iam_data() -> Callable[[Dict[str, List[str]]], ContextManager[MagicMock]]:
+    """Factory replacing the mocked IAM data with other actions per service"""
+    return _patch_iam_data
+
+
+@pytest.fixture(scope="session")
+def all_mock_actions() -> FrozenSet[str]:
+    """Every 'service:action' name of the mocked IAM data"""
+    return frozenset(
+        f"{service}:{action}"
+        for service, service_actions in ACTIONS_BY_SERVICE.items()
+        for action in service_actions
+    )
+
+
+@pytest.fixture(scope="session")
+def inverted_s3_get_actions(all_mock_actions: FrozenSet[str]) -> List[str]:
+    """Sorted inversion of 's3:Get*' over the mocked IAM data"""
+    return sorted(all_mock_actions - {"s3:GetBucket", "s3:GetObject"})
+
+
+def _build_sample_policy() -> Dict[str, Any]:
     return {
         "Version": "2012-10-17",
         "Statement": [
@@ -31,3 +65,14 @@ def sample_policy() -> Dict[str, Any]:
             },
         ],
     }
+
+
+@pytest.fixture
+def sample_policy() -> Dict[str, Any]:
+    return _build_sample_policy()
+
+
+@pytest.fixture(scope="session")
+def sample_policy_json() -> str:
+    """The sample policy serialized once, as the CLI reads it from stdin"""
+    return json.dumps(_build_sample_policy())
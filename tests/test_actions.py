@@ -1,5 +1,9 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
 import pytest
 
+from py_iam_expand import actions
 from py_iam_expand.actions import (
     InvalidActionHandling,
     InvalidActionPatternError,
@@ -7,28 +11,127 @@ from py_iam_expand.actions import (
     invert_actions,
 )
 
+# Sorted expansions of patterns several tests share
+S3_GET_ACTIONS = ("s3:GetBucket", "s3:GetObject")
+S3_GET_EC2_DESCRIBE_ACTIONS = (
+    "ec2:DescribeInstances",
+    "ec2:DescribeVolumes",
+    "s3:GetBucket",
+    "s3:GetObject",
+)
+
+INVALID_PATTERNS = (
+    "s3GetObject",  # Missing colon
+    ":GetObject",  # Missing service
+    "s3:",  # Missing action
+    "",  # Empty string
+)
+
 
 class TestActionExpansion:
     def test_expand_single_pattern(self):
         """Test expanding a single pattern"""
         result = expand_actions("s3:Get*")
-        assert result == ["s3:GetBucket", "s3:GetObject"]
+        assert result == list(S3_GET_ACTIONS)
 
     def test_expand_multiple_patterns(self):
         """Test expanding multiple patterns"""
         result = expand_actions(["s3:Get*", "ec2:Describe*"])
+        assert result == list(S3_GET_EC2_DESCRIBE_ACTIONS)
+
+    def test_expand_overlapping_patterns(self):
+        """Test expanding literal and wildcard patterns sharing services"""
+        result = expand_actions(
+            ["s3:GetObject", "s3:Get*", "iam:passrole", "iam:*AccessKeys"]
+        )
         assert result == [
-            "ec2:DescribeInstances",
-            "ec2:DescribeVolumes",
+            "iam:ListAccessKeys",
+            "iam:PassRole",
             "s3:GetBucket",
             "s3:GetObject",
         ]
 
-    def test_expand_all_wildcard(self):
+    def test_expand_repeated_calls_return_fresh_lists(self):
+        """Test that cached expansion results cannot be mutated by callers"""
+        first = expand_actions(["s3:Get*", "ec2:Describe*"])
+        first.append("iam:PassRole")
+        assert expand_actions(["s3:Get*", "ec2:Describe*"]) == list(
+            S3_GET_EC2_DESCRIBE_ACTIONS
+        )
+
+    def test_expand_combines_wildcards_for_a_service(self):
+        """Test that a service's regex patterns share one cached matcher"""
+        actions._compile_patterns.cache_clear()
+        patterns = ["iam:*Access*", "iam:?assRole"]
+        expected = ["iam:CreateAccessKey", "iam:ListAccessKeys", "iam:PassRole"]
+        assert expand_actions(patterns) == expected
+        # The pattern order differs, but the combined matcher is reused
+        assert expand_actions(patterns[::-1]) == expected
+        cache_info = actions._compile_patterns.cache_info()
+        assert (cache_info.misses, cache_info.hits) == (1, 1)
+
+    def test_expand_exact_action_name(self):
+        """Test that an exact name resolves without the general pattern path"""
+        with patch.object(
+            actions, "_resolve_pattern", wraps=actions._resolve_pattern
+        ) as mock_resolve:
+            assert expand_actions("S3:getobject") == ["s3:GetObject"]
+        mock_resolve.assert_not_called()
+
+    @pytest.mark.parametrize(
+        "mode,expected",
+        [
+            (InvalidActionHandling.RAISE_ERROR, []),
+            (InvalidActionHandling.REMOVE, []),
+            (InvalidActionHandling.KEEP, ["s3:NoSuchAction"]),
+        ],
+    )
+    def test_expand_unknown_exact_action_name(self, mode, expected):
+        """Test that an exact name that is not found is handled as usual"""
+        assert expand_actions("s3:NoSuchAction", invalid_handling=mode) == expected
+
+    @pytest.mark.parametrize(
+        "mode,expected",
+        [
+            (InvalidActionHandling.REMOVE, []),
+            (InvalidActionHandling.KEEP, ["nonexistent:GetObject"]),
+        ],
+    )
+    def test_expand_exact_action_of_unknown_service(self, mode, expected):
+        """Test that an exact name of an unknown service is handled as usual"""
+        assert (
+            expand_actions("nonexistent:GetObject", invalid_handling=mode) == expected
+        )
+
+    def test_expand_exact_action_of_unknown_service_raises(self):
+        """Test that an exact name of an unknown service raises by default"""
+        with pytest.raises(InvalidActionPatternError) as exc_info:
+            expand_actions("nonexistent:GetObject")
+        assert "Service 'nonexistent' not found" in str(exc_info.value)
+
+    def test_expand_single_pattern_is_cached(self):
+        """Test that a pattern's expansion is reused by later calls"""
+        actions._expand_pattern.cache_clear()
+        assert expand_actions("s3:Get*") == list(S3_GET_ACTIONS)
+        # Drop the sorted result so the second call expands the pattern again
+        actions._expand_sorted.cache_clear()
+        assert expand_actions("s3:Get*") == list(S3_GET_ACTIONS)
+        cache_info = actions._expand_pattern.cache_info()
+        assert (cache_info.misses, cache_info.hits) == (1, 1)
+
+    def test_expand_all_wildcard(self, all_mock_actions):
         """Test expanding '*' pattern"""
         result = expand_actions("*")
-        assert len(result) > 0
-        assert all(":" in action for action in result)
+        assert result == sorted(all_mock_actions)
+
+    def test_expand_all_wildcard_with_other_patterns(self):
+        """Test that '*' in a list yields every action but still validates"""
+        assert expand_actions(["s3:Get*", "*"]) == expand_actions("*")
+        assert expand_actions(
+            ["*", "invalid-format"], invalid_handling=InvalidActionHandling.REMOVE
+        ) == expand_actions("*")
+        with pytest.raises(InvalidActionPatternError):
+            expand_actions(["*", "invalid-format"])
 
     def test_expand_empty_list(self):
         """Test expanding empty list of patterns"""
@@ -36,40 +139,128 @@ class TestActionExpansion:
         assert result == []
 
     def test_expand_invalid_service(self):
-        """Test handling of non-existent service"""
-        # Test with RAISE_ERROR (default)
+        """Test handling of non-existent service with RAISE_ERROR (default)"""
         with pytest.raises(InvalidActionPatternError) as exc_info:
             expand_actions("nonexistent:*")
         assert "Service 'nonexistent' not found" in str(exc_info.value)
 
-        # Test with KEEP
-        result = expand_actions(
-            "nonexistent:*", invalid_handling=InvalidActionHandling.KEEP
-        )
-        assert result == ["nonexistent:*"]
-
-        # Test with REMOVE
-        result = expand_actions(
-            "nonexistent:*", invalid_handling=InvalidActionHandling.REMOVE
-        )
-        assert result == []
+    @pytest.mark.parametrize(
+        "mode,expected",
+        [
+            (InvalidActionHandling.KEEP, ["nonexistent:*"]),
+            (InvalidActionHandling.REMOVE, []),
+        ],
+    )
+    def test_expand_invalid_service_remove_or_keep(self, mode, expected):
+        """Test REMOVE/KEEP for non-existent service during expansion"""
+        assert expand_actions("nonexistent:*", invalid_handling=mode) == expected
 
-    def test_expand_case_sensitivity(self):
+    @pytest.mark.parametrize("pattern", ["s3:get*", "S3:GET*", "s3:GeT*"])
+    def test_expand_case_sensitivity(self, pattern):
         """Test case insensitive matching"""
-        lower_result = expand_actions("s3:get*")
-        upper_result = expand_actions("S3:GET*")
-        mixed_result = expand_actions("s3:GeT*")
-        assert lower_result == upper_result == mixed_result
+        assert expand_actions(pattern) == list(S3_GET_ACTIONS)
+
+    def test_expand_service_and_action_wildcards(self):
+        """Test wildcards in both the service and the action parts"""
+        result = expand_actions("?c?:Describe*")
+        assert result == ["ec2:DescribeInstances", "ec2:DescribeVolumes"]
+
+    @pytest.mark.parametrize(
+        "pattern,expected",
+        [
+            ("S*:Get*", list(S3_GET_ACTIONS)),
+            ("*2:DescribeVolumes", ["ec2:DescribeVolumes"]),
+            ("s*s:*", ["sts:AssumeRole"]),
+            ("*:passrole", ["iam:PassRole"]),
+        ],
+    )
+    def test_expand_service_wildcard_shapes(self, pattern, expected):
+        """Test prefix, suffix and infix wildcards in the service part"""
+        assert expand_actions(pattern) == expected
+
+    def test_expand_any_service_action_uses_name_index(self):
+        """Test that '*:Action' is answered from the reverse action name index"""
+        with patch.object(
+            actions._ActionIndex,
+            "get_actions_named",
+            autospec=True,
+            side_effect=actions._ActionIndex.get_actions_named,
+        ) as mock_named:
+            assert expand_actions("*:PassRole") == ["iam:PassRole"]
+        mock_named.assert_called_once()
+        assert mock_named.call_args.args[1] == "passrole"
+
+    @pytest.mark.parametrize(
+        "pattern,expected",
+        [
+            ("iam:*Keys", ["iam:ListAccessKeys"]),
+            ("iam:c*KEY", ["iam:CreateAccessKey"]),
+            ("iam:*AccessKey*", ["iam:CreateAccessKey", "iam:ListAccessKeys"]),
+            ("iam:PassRole*", ["iam:PassRole"]),
+            ("iam:PassRole*e", []),
+        ],
+    )
+    def test_expand_wildcard_shapes(self, pattern, expected):
+        """Test prefix, suffix and infix wildcard shapes"""
+        result = expand_actions(pattern, invalid_handling=InvalidActionHandling.REMOVE)
+        assert result == expected
 
+    @pytest.mark.parametrize("pattern", ["s3:\U0010ffff*", "s3:Get\U0010ffff*Object"])
     @pytest.mark.parametrize(
-        "pattern",
+        "mode,keeps_pattern",
         [
-            "s3GetObject",  # Missing colon
-            ":GetObject",  # Missing service
-            "s3:",  # Missing action
-            "",  # Empty string
+            (InvalidActionHandling.RAISE_ERROR, False),
+            (InvalidActionHandling.REMOVE, False),
+            (InvalidActionHandling.KEEP, True),
         ],
     )
+    def test_expand_prefix_ending_in_max_code_point(self, pattern, mode, keeps_pattern):
+        """Test that a prefix ending in U+10FFFF matches nothing instead of failing"""
+        result = expand_actions(pattern, invalid_handling=mode)
+        assert result == ([pattern] if keeps_pattern else [])
+
+    def test_expand_follows_replaced_iam_data(self, use_iam_data):
+        """Test that cached lookups are rebuilt when iam_data is replaced"""
+        assert expand_actions("s3:Get*") == list(S3_GET_ACTIONS)
+        with use_iam_data({"s3": ["GetAcl"]}):
+            assert expand_actions("s3:Get*") == ["s3:GetAcl"]
+        assert expand_actions("s3:Get*") == list(S3_GET_ACTIONS)
+
+    def test_expand_keeps_names_differing_only_by_case(self, use_iam_data):
+        """Test that prefix and regex wildcards agree on case-colliding names"""
+        with use_iam_data(
+            {"EC2": ["DescribeInstances", "describeinstances", "Describe-X"]}
+        ):
+            expected = [
+                "EC2:Describe-X",
+                "EC2:DescribeInstances",
+                "EC2:describeinstances",
+            ]
+            assert expand_actions("ec2:Describe*") == expected
+            assert expand_actions("ec2:Describ?*") == expected
+            assert invert_actions("ec2:Describe*") == []
+
+    def test_expand_exact_name_prefers_first_case_match(self, use_iam_data):
+        """Test that an exact name resolves to the first case-insensitive match"""
+        with use_iam_data({"EC2": ["DescribeInstances", "describeinstances"]}):
+            assert expand_actions("EC2:describeinstances") == ["EC2:DescribeInstances"]
+            assert expand_actions("*:DESCRIBEINSTANCES") == ["EC2:DescribeInstances"]
+
+    def test_expand_validates_before_loading_actions(self, mock_iam_data):
+        """Test that an invalid pattern fails before any service data is read"""
+        with pytest.raises(InvalidActionPatternError) as exc_info:
+            expand_actions(["s3:Get*", "ec2:Describe*", "ec2"])
+        assert "'ec2'" in str(exc_info.value)
+        mock_iam_data.actions.get_actions_for_service.assert_not_called()
+
+    def test_expand_from_threads(self):
+        """Test that concurrent callers share the lazily built lookups safely"""
+        patterns = ["s3:Get*", "?c?:Describe*", "iam:*AccessKey*", "*:AssumeRole"]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(expand_actions, patterns * 8))
+        assert results == [expand_actions(pattern) for pattern in patterns] * 8
+
+    @pytest.mark.parametrize("pattern", INVALID_PATTERNS)
     def test_expand_invalid_formats(self, pattern):
         """Test various invalid pattern formats"""
         with pytest.raises(InvalidActionPatternError):
@@ -78,29 +269,11 @@ class TestActionExpansion:
 
 class TestActionInversion:
 
-    # Define the expected full set of actions based on the conftest.py mock
-    # This is what _get_all_actions() SHOULD return when using the mock
-    EXPECTED_ALL_ACTIONS_FROM_MOCK = {
-        "s3:GetObject",
-        "s3:GetBucket",
-        "ec2:DescribeInstances",
-        "ec2:DescribeVolumes",
-        "iam:PassRole",
-        "iam:CreateAccessKey",
-        "iam:ListAccessKeys",
-        "sts:AssumeRole",
-    }
-
-    def test_invert_single_pattern(self):
+    def test_invert_single_pattern(self, inverted_s3_get_actions):
         """Test inverting a single pattern"""
-        actions_to_exclude = {"s3:GetBucket", "s3:GetObject"}
-        result = invert_actions("s3:Get*")
-        expected = sorted(
-            list(self.EXPECTED_ALL_ACTIONS_FROM_MOCK - actions_to_exclude)
-        )
-        assert result == expected
+        assert invert_actions("s3:Get*") == inverted_s3_get_actions
 
-    def test_invert_multiple_patterns(self):
+    def test_invert_multiple_patterns(self, all_mock_actions):
         """Test inverting multiple patterns"""
         actions_to_exclude = {
             "s3:GetBucket",
@@ -110,54 +283,67 @@ class TestActionInversion:
             "iam:PassRole",
         }
         result = invert_actions(["s3:Get*", "ec2:Describe*", "iam:PassRole"])
-        expected = sorted(
-            list(self.EXPECTED_ALL_ACTIONS_FROM_MOCK - actions_to_exclude)
-        )
+        expected = sorted(all_mock_actions - actions_to_exclude)
         assert result == expected
 
-    def test_invert_all_wildcard(self):
+    def test_invert_all_wildcard(self, all_mock_actions):
         """Test inverting the '*' pattern (should exclude everything from the mock set)"""
         # expand_actions("*") will expand based on the conftest mock
-        actions_to_exclude = self.EXPECTED_ALL_ACTIONS_FROM_MOCK
+        actions_to_exclude = all_mock_actions
         result = invert_actions("*")
         # Subtracting all known mock actions from all known mock actions
-        expected = sorted(
-            list(self.EXPECTED_ALL_ACTIONS_FROM_MOCK - actions_to_exclude)
-        )
+        expected = sorted(all_mock_actions - actions_to_exclude)
         assert result == []
         assert expected == []  # Double check calculation
 
-    def test_invert_empty_list(self):
+    def test_invert_empty_list(self, all_mock_actions):
         """Test inverting an empty list (should exclude nothing)"""
         actions_to_exclude = set()
         result = invert_actions([])
         # Subtracting an empty set should return all actions
-        expected = sorted(
-            list(self.EXPECTED_ALL_ACTIONS_FROM_MOCK - actions_to_exclude)
-        )
+        expected = sorted(all_mock_actions - actions_to_exclude)
         assert result == expected
-        assert result == sorted(list(self.EXPECTED_ALL_ACTIONS_FROM_MOCK))
+        assert result == sorted(all_mock_actions)
 
-    def test_invert_non_matching_pattern(self):
+    def test_invert_non_matching_pattern(self, all_mock_actions):
         """Test inverting a pattern that matches no actions"""
         actions_to_exclude = set()  # "s3:List*" matches nothing in the mock
         result = invert_actions("s3:List*")
         # Should exclude nothing
-        expected = sorted(
-            list(self.EXPECTED_ALL_ACTIONS_FROM_MOCK - actions_to_exclude)
-        )
+        expected = sorted(all_mock_actions - actions_to_exclude)
         assert result == expected
-        assert result == sorted(list(self.EXPECTED_ALL_ACTIONS_FROM_MOCK))
+        assert result == sorted(all_mock_actions)
 
-    def test_invert_case_insensitivity(self):
+    def test_invert_case_insensitivity(self, all_mock_actions):
         """Test case insensitivity for patterns during inversion"""
         actions_to_exclude = {"ec2:DescribeInstances", "ec2:DescribeVolumes"}
         result = invert_actions("Ec2:DESCRIBE*")  # Mixed case
-        expected = sorted(
-            list(self.EXPECTED_ALL_ACTIONS_FROM_MOCK - actions_to_exclude)
-        )
+        expected = sorted(all_mock_actions - actions_to_exclude)
         assert result == expected
 
+    def test_invert_repeated_calls_return_fresh_lists(self, inverted_s3_get_actions):
+        """Test that cached inversion results cannot be mutated by callers"""
+        first = invert_actions("s3:Get*")
+        first.clear()
+        assert invert_actions("s3:Get*") == inverted_s3_get_actions
+
+    def test_invert_orders_across_similar_service_keys(self, use_iam_data):
+        """Test that the output is fully sorted when service keys share prefixes"""
+        service_keys = ["a", "a-b", "A2"]
+        with use_iam_data(dict.fromkeys(service_keys, ["Get", "a"])):
+            result = invert_actions([])
+        assert result == sorted(
+            f"{service}:{action}" for service in service_keys for action in ["Get", "a"]
+        )
+        assert result[:2] == ["A2:Get", "A2:a"]
+
+    def test_invert_reads_iam_data_once(self, mock_iam_data):
+        """Test that the full action list is built once per dataset"""
+        invert_actions("s3:Get*")
+        invert_actions(["ec2:Describe*", "iam:PassRole"])
+        assert mock_iam_data.services.get_service_keys.call_count == 1
+        assert mock_iam_data.actions.get_actions_for_service.call_count == 4
+
     def test_invert_invalid_pattern_raise(self):
         """Test RAISE_ERROR for invalid patterns during inversion"""
         with pytest.raises(InvalidActionPatternError) as exc_info:
@@ -167,30 +353,22 @@ class TestActionInversion:
             )
         assert "invalid-format" in str(exc_info.value)
 
-    def test_invert_invalid_pattern_remove(self):
+    def test_invert_invalid_pattern_remove(self, inverted_s3_get_actions):
         """Test REMOVE for invalid patterns during inversion"""
         # 'invalid-format' should be ignored, only 's3:Get*' used for exclusion
-        actions_to_exclude = {"s3:GetBucket", "s3:GetObject"}
         result = invert_actions(
             ["s3:Get*", "invalid-format"], invalid_handling=InvalidActionHandling.REMOVE
         )
-        expected = sorted(
-            list(self.EXPECTED_ALL_ACTIONS_FROM_MOCK - actions_to_exclude)
-        )
-        assert result == expected
+        assert result == inverted_s3_get_actions
 
-    def test_invert_invalid_pattern_keep(self):
+    def test_invert_invalid_pattern_keep(self, inverted_s3_get_actions):
         """Test KEEP for invalid patterns during inversion"""
         # 'invalid-format' should be ignored for exclusion purposes, only 's3:Get*' used
         # KEEP behaves like REMOVE in the context of *excluding* actions
-        actions_to_exclude = {"s3:GetBucket", "s3:GetObject"}
         result = invert_actions(
             ["s3:Get*", "invalid-format"], invalid_handling=InvalidActionHandling.KEEP
         )
-        expected = sorted(
-            list(self.EXPECTED_ALL_ACTIONS_FROM_MOCK - actions_to_exclude)
-        )
-        assert result == expected
+        assert result == inverted_s3_get_actions
 
     def test_invert_invalid_service_raise(self):
         """Test RAISE_ERROR for non-existent service during inversion"""
@@ -201,13 +379,11 @@ class TestActionInversion:
             )
         assert "Service 'nonexistent' not found" in str(exc_info.value)
 
-    def test_invert_invalid_service_remove_or_keep(self):
+    @pytest.mark.parametrize(
+        "mode", [InvalidActionHandling.REMOVE, InvalidActionHandling.KEEP]
+    )
+    def test_invert_invalid_service_remove_or_keep(self, mode, inverted_s3_get_actions):
         """Test REMOVE/KEEP for non-existent service during inversion"""
         # 'nonexistent:*' should be ignored for exclusion, only 's3:Get*' used
-        actions_to_exclude = {"s3:GetBucket", "s3:GetObject"}
-        for mode in [InvalidActionHandling.REMOVE, InvalidActionHandling.KEEP]:
-            result = invert_actions(["s3:Get*", "nonexistent:*"], invalid_handling=mode)
-            expected = sorted(
-                list(self.EXPECTED_ALL_ACTIONS_FROM_MOCK - actions_to_exclude)
-            )
-            assert result == expected
+        result = invert_actions(["s3:Get*", "nonexistent:*"], invalid_handling=mode)
+        assert result == inverted_s3_get_actions
@@ -1,38 +1,67 @@
+import io
 import json
-from unittest.mock import patch
+import re
+import sys
+from typing import NamedTuple, Optional, Union
 
 import pytest
 
 from py_iam_expand.cli import main
 
+INVALID_SERVICE_STDIN = "nonexistent:*"
+# Help output starts with the usage line, which wraps before ACTION_PATTERN
+USAGE_RE = re.compile(r"usage: py-iam-expand .*\bACTION_PATTERN\b", re.DOTALL)
+
+EXPAND_GET_OUT = "s3:GetBucket\ns3:GetObject\n"
+EXPAND_MULTI_OUT = (
+    "ec2:DescribeInstances\nec2:DescribeVolumes\ns3:GetBucket\ns3:GetObject\n"
+)
+POLICY_EXPANDED_ACTION = ["s3:GetBucket", "s3:GetObject"]
+POLICY_EXPANDED_NOTACTION = [
+    "ec2:DescribeInstances",
+    "ec2:DescribeVolumes",
+    "iam:CreateAccessKey",
+    "iam:ListAccessKeys",
+]
+
+
+class CliResult(NamedTuple):
+    out: str
+    err: str
+    exit_code: Union[int, str, None]
+
+
+@pytest.fixture
+def run_cli(monkeypatch, capsys):
+    """Run the CLI in-process and return its captured output and exit code"""
+
+    def _run_cli(*args: str, stdin: Optional[str] = None) -> CliResult:
+        monkeypatch.setattr(sys, "argv", ["py-iam-expand", *args])
+        if stdin is not None:
+            # StringIO is non-interactive, so the CLI reads it like piped input
+            monkeypatch.setattr(sys, "stdin", io.StringIO(stdin))
+        try:
+            main()
+            exit_code: Union[int, str, None] = 0
+        except SystemExit as e:
+            exit_code = e.code
+        captured = capsys.readouterr()
+        return CliResult(captured.out, captured.err, exit_code)
+
+    return _run_cli
+
 
 class TestCliInterface:
-    def test_basic_command(self, capsys):
+    def test_basic_command(self, run_cli):
         """Test basic command line usage"""
-        with patch("sys.argv", ["py-iam-expand", "s3:Get*"]):
-            main()
-            captured = capsys.readouterr()
-            assert "s3:GetBucket" in captured.out
-            assert "s3:GetObject" in captured.out
+        assert run_cli("s3:Get*").out == EXPAND_GET_OUT
 
-    def test_policy_input(self, sample_policy, capsys):
+    def test_policy_input(self, sample_policy_json, run_cli):
         """Test processing policy from stdin"""
-        with patch("sys.stdin.read", return_value=json.dumps(sample_policy)):
-            with patch("sys.stdin.isatty", return_value=False):
-                with patch("sys.argv", ["py-iam-expand"]):
-                    main()
-                    captured = capsys.readouterr()
-                    output_policy = json.loads(captured.out)
-                    assert output_policy["Statement"][0]["Action"] == [
-                        "s3:GetBucket",
-                        "s3:GetObject",
-                    ]
-                    assert output_policy["Statement"][1]["NotAction"] == [
-                        "ec2:DescribeInstances",
-                        "ec2:DescribeVolumes",
-                        "iam:CreateAccessKey",
-                        "iam:ListAccessKeys",
-                    ]
+        result = run_cli(stdin=sample_policy_json)
+        output_policy = json.loads(result.out)
+        assert output_policy["Statement"][0]["Action"] == POLICY_EXPANDED_ACTION
+        assert output_policy["Statement"][1]["NotAction"] == POLICY_EXPANDED_NOTACTION
 
     @pytest.mark.parametrize(
         "invalid_input,expected_error",
@@ -49,180 +78,103 @@ class TestCliInterface:
             ),
         ],
     )
-    def test_invalid_inputs(self, invalid_input, expected_error, capsys):
+    def test_invalid_inputs(self, invalid_input, expected_error, run_cli):
         """Test handling of various invalid inputs"""
-        with patch("sys.stdin.read", return_value=invalid_input):
-            with patch("sys.stdin.isatty", return_value=False):
-                with patch("sys.argv", ["py-iam-expand"]):
-                    with pytest.raises(SystemExit):
-                        main()
-                    captured = capsys.readouterr()
-                    assert expected_error in captured.err
-
-    def test_no_args_interactive(self, capsys):
+        result = run_cli(stdin=invalid_input)
+        assert result.exit_code == 1
+        assert expected_error in result.err
+
+    def test_no_args_interactive(self, monkeypatch, run_cli):
         """Test behavior when no args provided in interactive mode"""
-        with patch("sys.argv", ["py-iam-expand"]):
-            with patch("sys.stdin.isatty", return_value=True):
-                with pytest.raises(SystemExit) as exc_info:
-                    main()
-                assert exc_info.value.code == 1
-                captured = capsys.readouterr()
-                assert "usage: py-iam-expand" in captured.err
-
-    def test_invert_with_policy_input(self, sample_policy, capsys):
+        monkeypatch.setattr(sys.stdin, "isatty", lambda: True)
+        result = run_cli()
+        assert result.exit_code == 1
+        assert USAGE_RE.match(result.err)
+
+    def test_invert_with_policy_input(self, sample_policy_json, run_cli):
         """Test that --invert flag is rejected when processing policy"""
-        with patch("sys.stdin.read", return_value=json.dumps(sample_policy)):
-            with patch("sys.stdin.isatty", return_value=False):
-                with patch("sys.argv", ["py-iam-expand", "--invert"]):
-                    with pytest.raises(SystemExit) as exc_info:
-                        main()
-                    assert exc_info.value.code == 1
-                    captured = capsys.readouterr()
-                    assert (
-                        "Error: --invert flag cannot be used when processing a JSON policy"
-                        in captured.err
-                    )
-
-    def test_invalid_json_policy(self, capsys):
+        result = run_cli("--invert", stdin=sample_policy_json)
+        assert result.exit_code == 1
+        assert result.err.startswith(
+            "Error: --invert flag cannot be used when processing a JSON policy"
+        )
+
+    def test_invalid_json_policy(self, run_cli):
         """Test handling of malformed JSON input"""
-        invalid_json = "{invalid json"
-        with patch("sys.stdin.read", return_value=invalid_json):
-            with patch("sys.stdin.isatty", return_value=False):
-                with patch("sys.argv", ["py-iam-expand"]):
-                    with pytest.raises(SystemExit):
-                        main()
-                    captured = capsys.readouterr()
-                    assert "Invalid JSON policy provided via stdin" in captured.err
-
-    def test_cli_multiple_patterns(self, capsys):
+        result = run_cli(stdin="{invalid json")
+        assert result.exit_code == 1
+        assert "Invalid JSON policy provided via stdin" in result.err
+
+    def test_cli_multiple_patterns(self, run_cli):
         """Test handling multiple patterns as arguments"""
-        with patch("sys.argv", ["py-iam-expand", "s3:Get*", "ec2:Describe*"]):
-            main()
-            captured = capsys.readouterr()
-            assert "s3:" in captured.out
-            assert "ec2:" in captured.out
+        assert run_cli("s3:Get*", "ec2:Describe*").out == EXPAND_MULTI_OUT
 
-    def test_cli_empty_stdin(self, capsys):
+    def test_cli_empty_stdin(self, run_cli):
         """Test handling empty stdin"""
-        with patch("sys.stdin.read", return_value=""):
-            with patch("sys.stdin.isatty", return_value=False):
-                with patch("sys.argv", ["py-iam-expand"]):
-                    with pytest.raises(SystemExit) as exc_info:
-                        main()
-                    assert exc_info.value.code == 1
-                    captured = capsys.readouterr()
-                    assert "Error:" in captured.err
+        result = run_cli(stdin="")
+        assert result.exit_code == 1
+        assert result.err.startswith("Error:")
 
     @pytest.mark.parametrize("flag", ["-i", "--invert"])
-    def test_cli_invert_flags(self, flag, capsys):
+    def test_cli_invert_flags(self, flag, inverted_s3_get_actions, run_cli):
         """Test both short and long invert flags"""
-        with patch("sys.argv", ["py-iam-expand", flag, "s3:Get*"]):
-            main()
-            captured = capsys.readouterr()
-            output_lines = captured.out.splitlines()
-
-            # Verify that the output:
-            # 1. Contains actions from other services
-            # 2. Does not contain the actions we excluded (s3:Get*)
-            # 3. Contains at least one line
-            assert len(output_lines) > 0
-            assert any(
-                line.startswith(("ec2:", "iam:", "sts:")) for line in output_lines
-            )
-            assert not any(line.startswith("s3:Get") for line in output_lines)
-
-            # Optional: Verify specific expected actions are present
-            assert "iam:PassRole" in output_lines
-            assert "ec2:DescribeInstances" in output_lines
-
-    def test_cli_invert_specific_verification(self, capsys):
+        output_lines = run_cli(flag, "s3:Get*").out.splitlines()
+        # Every mocked action except the excluded s3:Get* ones, in sorted order
+        assert output_lines == inverted_s3_get_actions
+
+    def test_cli_invert_specific_verification(self, run_cli, use_iam_data):
         """Test invert operation with specific pattern and verification"""
-        with patch("sys.argv", ["py-iam-expand", "-i", "s3:Get*"]):
-            with patch("py_iam_expand.actions._get_all_actions") as mock_all_actions:
-                # Mock a smaller set of actions for easier testing
-                mock_all_actions.return_value = {
-                    "s3:GetObject",
-                    "s3:GetBucket",
-                    "s3:PutObject",
-                    "EC2:DescribeInstances",
-                    "IAM:PassRole",
-                }
-
-                main()
-                captured = capsys.readouterr()
-                output_lines = set(captured.out.splitlines())
-
-                # Should contain these actions
-                expected_actions = {
-                    "s3:PutObject",
-                    "EC2:DescribeInstances",
-                    "IAM:PassRole",
-                }
-                # Should not contain these actions
-                excluded_actions = {"s3:GetObject", "s3:GetBucket"}
-
-                assert output_lines == expected_actions
-                assert not (output_lines & excluded_actions)
-
-    def test_cli_invalid_service_keep(self, capsys):
-        """Test CLI with invalid service and KEEP handling"""
-        with patch("sys.stdin.read", return_value="nonexistent:*"):
-            with patch("sys.stdin.isatty", return_value=False):
-                with patch("sys.argv", ["py-iam-expand", "--invalid-action", "keep"]):
-                    main()
-                    captured = capsys.readouterr()
-                    # Split by newline and filter out empty lines
-                    output = [line for line in captured.out.splitlines() if line]
-                    assert output == ["nonexistent:*"]
-
-    def test_cli_invalid_service_remove(self, capsys):
-        """Test CLI with invalid service and REMOVE handling"""
-        with patch("sys.stdin.read", return_value="nonexistent:*"):
-            with patch("sys.stdin.isatty", return_value=False):
-                with patch("sys.argv", ["py-iam-expand", "--invalid-action", "remove"]):
-                    main()
-                    captured = capsys.readouterr()
-                    # Split by newline and filter out empty lines
-                    output = [line for line in captured.out.splitlines() if line]
-                    assert output == []
-
-    def test_cli_invalid_service_default(self, capsys):
-        """Test CLI with invalid service and default (RAISE_ERROR) handling"""
-        with patch("sys.stdin.read", return_value="nonexistent:*"):
-            with patch("sys.stdin.isatty", return_value=False):
-                with patch("sys.argv", ["py-iam-expand"]):
-                    with pytest.raises(SystemExit) as exc_info:
-                        main()
-                    assert exc_info.value.code == 1
-                    captured = capsys.readouterr()
-                    assert "Service 'nonexistent' not found" in captured.err
-
-    def test_cli_policy_invalid_service_keep(self, sample_policy, capsys):
-        """Test CLI policy mode with invalid service and KEEP handling"""
-        policy = {
-            "Statement": [
-                {"Effect": "Allow", "Action": "nonexistent:*", "Resource": "*"}
-            ]
+        # A smaller dataset for easier testing
+        actions_by_service = {
+            "EC2": ["DescribeInstances"],
+            "IAM": ["PassRole"],
+            "s3": ["GetBucket", "GetObject", "PutObject"],
         }
-        with patch("sys.stdin.read", return_value=json.dumps(policy)):
-            with patch("sys.stdin.isatty", return_value=False):
-                with patch("sys.argv", ["py-iam-expand", "--invalid-action", "keep"]):
-                    main()
-                    captured = capsys.readouterr()
-                    output_policy = json.loads(captured.out)
-                    assert output_policy["Statement"][0]["Action"] == ["nonexistent:*"]
-
-    def test_cli_policy_invalid_service_remove(self, sample_policy, capsys):
-        """Test CLI policy mode with invalid service and REMOVE handling"""
+        with use_iam_data(actions_by_service):
+            output_lines = set(run_cli("-i", "s3:Get*").out.splitlines())
+
+            # Should contain these actions
+            expected_actions = {
+                "s3:PutObject",
+                "EC2:DescribeInstances",
+                "IAM:PassRole",
+            }
+            # Should not contain these actions
+            excluded_actions = {"s3:GetObject", "s3:GetBucket"}
+
+            assert output_lines == expected_actions
+            assert not (output_lines & excluded_actions)
+
+    @pytest.mark.parametrize(
+        "handling,expected_output",
+        [("keep", ["nonexistent:*"]), ("remove", [])],
+    )
+    def test_cli_invalid_service_handling(self, handling, expected_output, run_cli):
+        """Test CLI with invalid service and KEEP/REMOVE handling"""
+        result = run_cli("--invalid-action", handling, stdin=INVALID_SERVICE_STDIN)
+        # Split by newline and filter out empty lines
+        output = [line for line in result.out.splitlines() if line]
+        assert output == expected_output
+
+    def test_cli_invalid_service_default(self, run_cli):
+        """Test CLI with invalid service and default (RAISE_ERROR) handling"""
+        result = run_cli(stdin=INVALID_SERVICE_STDIN)
+        assert result.exit_code == 1
+        assert "Service 'nonexistent' not found" in result.err
+
+    @pytest.mark.parametrize(
+        "handling,expected_actions",
+        [("keep", ["nonexistent:*"]), ("remove", [])],
+    )
+    def test_cli_policy_invalid_service_handling(
+        self, handling, expected_actions, run_cli
+    ):
+        """Test CLI policy mode with invalid service and KEEP/REMOVE handling"""
         policy = {
             "Statement": [
                 {"Effect": "Allow", "Action": "nonexistent:*", "Resource": "*"}
             ]
         }
-        with patch("sys.stdin.read", return_value=json.dumps(policy)):
-            with patch("sys.stdin.isatty", return_value=False):
-                with patch("sys.argv", ["py-iam-expand", "--invalid-action", "remove"]):
-                    main()
-                    captured = capsys.readouterr()
-                    output_policy = json.loads(captured.out)
-                    assert output_policy["Statement"][0]["Action"] == []
+        result = run_cli("--invalid-action", handling, stdin=json.dumps(policy))
+        output_policy = json.loads(result.out)
+        assert output_policy["Statement"][0]["Action"] == expected_actions
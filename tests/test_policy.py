@@ -1,5 +1,9 @@
+from collections import OrderedDict
+from unittest.mock import patch
+
 import pytest
 
+from py_iam_expand import policy as policy_module
 from py_iam_expand.actions import InvalidActionHandling, InvalidActionPatternError
 from py_iam_expand.policy import expand_policy_actions
 
@@ -26,17 +30,50 @@ class TestPolicyExpansion:
         result = expand_policy_actions(policy)
         assert result == policy
 
-    def test_invalid_policy_structure(self):
-        """Test handling of invalid policy structure"""
-        invalid_policies = [
+    def test_expand_policy_leaves_input_untouched(self):
+        """Test that the result shares no mutable containers with the input"""
+        policy = {
+            "Statement": [
+                {
+                    "Action": ["s3:Get*"],
+                    "Resource": ["arn:aws:s3:::bucket/*"],
+                    "Condition": {"Bool": {"aws:SecureTransport": ["true"]}},
+                }
+            ]
+        }
+        result = expand_policy_actions(policy)
+        result["Statement"][0]["Resource"].append("*")
+        result["Statement"][0]["Condition"]["Bool"].clear()
+
+        statement = policy["Statement"][0]
+        assert statement["Action"] == ["s3:Get*"]
+        assert statement["Resource"] == ["arn:aws:s3:::bucket/*"]
+        assert statement["Condition"] == {"Bool": {"aws:SecureTransport": ["true"]}}
+
+    def test_expand_policy_copies_non_json_values(self):
+        """Test that values JSON can't produce are deep-copied, keeping their type"""
+        condition = OrderedDict(StringEquals={"aws:PrincipalTag/team": {"a"}})
+        policy = {"Statement": [{"Action": "s3:Get*", "Condition": condition}]}
+        result = expand_policy_actions(policy)
+
+        result_condition = result["Statement"][0]["Condition"]
+        assert type(result_condition) is OrderedDict
+        assert result_condition == condition
+        result_condition["StringEquals"]["aws:PrincipalTag/team"].add("b")
+        assert condition["StringEquals"]["aws:PrincipalTag/team"] == {"a"}
+
+    @pytest.mark.parametrize(
+        "policy",
+        [
             {},  # Missing Statement
             {"Statement": "not-a-list"},  # Statement not a list
             {"Statement": [{"Action": 123}]},  # Invalid Action type
-        ]
-
-        for policy in invalid_policies:
-            with pytest.raises((ValueError, TypeError)):
-                expand_policy_actions(policy)
+        ],
+    )
+    def test_invalid_policy_structure(self, policy):
+        """Test handling of invalid policy structure"""
+        with pytest.raises((ValueError, TypeError)):
+            expand_policy_actions(policy)
 
     def test_expand_policy_with_unicode(self):
         """Test handling of Unicode characters in policy"""
@@ -77,6 +114,22 @@ class TestPolicyExpansion:
         with pytest.raises(TypeError):
             expand_policy_actions(policy)
 
+    def test_invalid_types_fail_before_expanding(self):
+        """Test that type errors in any statement are raised before expansion"""
+        policy = {
+            "Statement": [
+                {"Action": "s3:Get*"},
+                {"Action": "ec2:Describe*", "NotAction": 123},
+            ]
+        }
+        with patch.object(policy_module, "expand_actions") as mock_expand:
+            with pytest.raises(TypeError) as exc_info:
+                expand_policy_actions(policy)
+        assert str(exc_info.value) == (
+            "Statement 1: 'NotAction' must be a string or list of strings."
+        )
+        mock_expand.assert_not_called()
+
     @pytest.fixture
     def policy_with_invalid_actions(self):
         """Policy containing various invalid patterns"""